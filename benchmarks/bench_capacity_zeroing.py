@@ -0,0 +1,70 @@
+"""
+Benchmark of the per half cycle capacity zeroing used by the Arbin, Biologic and Ivium processors.
+Compares the grouped zero_by_half_cycle/cumsum_by_half_cycle against the original loop over half cycles,
+which masks the whole frame once per half cycle, for a fixed number of rows and an increasing number of cycles.
+
+Run from the repository root with:
+    python benchmarks/bench_capacity_zeroing.py [n_rows] [n_cycles ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+import navani.echem as ec
+from common import synthetic_frame
+
+
+def legacy_zeroing(df):
+    df = df.copy()
+    for cycle in df['half cycle'].unique():
+        idx = df[(df['half cycle'] == cycle) & (df['state'] != 'R')].index
+        if len(idx) > 0:
+            cycle_idx = df[df['half cycle'] == cycle].index
+            initial_capacity = df.loc[idx[0], 'Capacity']
+            df.loc[cycle_idx, 'Capacity'] = df.loc[cycle_idx, 'Capacity'] - initial_capacity
+    return df['Capacity']
+
+
+def legacy_cumsum(df):
+    df = df.copy()
+    for cycle in df['half cycle'].unique():
+        idx = df.index[df['half cycle'] == cycle]
+        df.loc[idx, 'dQ'] = df.loc[idx, 'dQ'].cumsum()
+    return df['dQ']
+
+
+def grouped_zeroing(df):
+    return ec.zero_by_half_cycle(df['Capacity'], df['half cycle'], mask=df['state'] != 'R')
+
+
+def grouped_cumsum(df):
+    return ec.cumsum_by_half_cycle(df['dQ'], df['half cycle'])
+
+
+def best_time(func, df, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(n_rows, cycle_counts):
+    print(f"{n_rows} rows")
+    print(f"{'cycles':>8} {'zero loop / s':>14} {'zero grouped / s':>17} {'cumsum loop / s':>16} {'cumsum grouped / s':>19}")
+    for n_cycles in cycle_counts:
+        df = synthetic_frame(n_rows, n_cycles)
+        t_loop, zero_loop = best_time(legacy_zeroing, df, repeat=1)
+        t_grouped, zero_grouped = best_time(grouped_zeroing, df)
+        t_cum_loop, cum_loop = best_time(legacy_cumsum, df, repeat=1)
+        t_cum_grouped, cum_grouped = best_time(grouped_cumsum, df)
+        np.testing.assert_array_equal(zero_loop.to_numpy(), zero_grouped.to_numpy())
+        np.testing.assert_allclose(cum_loop.to_numpy(), cum_grouped.to_numpy(), rtol=1e-12)
+        print(f"{n_cycles:>8} {t_loop:>14.4f} {t_grouped:>17.4f} {t_cum_loop:>16.4f} {t_cum_grouped:>19.4f}")
+
+
+if __name__ == '__main__':
+    args = [int(float(arg)) for arg in sys.argv[1:]]
+    main(args[0] if args else 200_000, args[1:] or [10, 100, 500, 2000])
@@ -0,0 +1,49 @@
+"""
+Benchmark of selecting every half cycle of a frame one at a time, with a boolean mask over the whole frame
+as in df[df['half cycle'] == cycle], and with the cycle index of the df.cycles accessor (including the time to build it).
+
+Run from the repository root with:
+    python benchmarks/bench_cycle_index.py [n_rows] [n_cycles ...]
+"""
+import sys
+import time
+
+import navani.echem as ec
+from common import synthetic_frame
+
+
+def select_masked(df, cycles):
+    return [df[df['half cycle'] == cycle] for cycle in cycles]
+
+
+def select_indexed(df, cycles):
+    df.cycles.rebuild()
+    return [df.cycles.get_cycle(cycle) for cycle in cycles]
+
+
+def main(n_rows, cycle_counts):
+    print(f"{n_rows} rows")
+    print(f"{'cycles':>8} {'build index / ms':>17} {'masked / s':>11} {'indexed / s':>12} {'speedup':>8}")
+    for n_cycles in cycle_counts:
+        df = synthetic_frame(n_rows, n_cycles)
+        cycles = list(range(1, 2 * n_cycles + 1))
+
+        start = time.perf_counter()
+        ec.CycleIndex(df['half cycle'])
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        masked = select_masked(df, cycles)
+        masked_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = select_indexed(df, cycles)
+        indexed_time = time.perf_counter() - start
+
+        assert all(a.index.equals(b.index) for a, b in zip(masked, indexed))
+        print(f"{n_cycles:>8} {build * 1e3:>17.1f} {masked_time:>11.3f} {indexed_time:>12.3f} {masked_time / indexed_time:>8.1f}")
+
+
+if __name__ == '__main__':
+    args = [int(float(arg)) for arg in sys.argv[1:]]
+    main(args[0] if args else 1_000_000, args[1:] or [10, 100, 1000])
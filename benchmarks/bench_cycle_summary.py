@@ -0,0 +1,64 @@
+"""
+Benchmark of cycle_summary against the original implementation, which made separate groupby passes over the frame
+and masked the whole frame once per half cycle to integrate the average voltage.
+
+Run from the repository root with:
+    python benchmarks/bench_cycle_summary.py [n_rows] [n_cycles ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import navani.echem as ec
+from common import synthetic_frame
+
+
+def legacy_cycle_summary(df, current_label='Current'):
+    df = df.copy()
+    df['full cycle'] = (df['half cycle']/2).apply(np.ceil)
+    summary_df = df.groupby('full cycle')[current_label].mean().to_frame()
+    summary_df['UCV'] = df.groupby('full cycle')['Voltage'].max()
+    summary_df['LCV'] = df.groupby('full cycle')['Voltage'].min()
+
+    dis_mask = df['state'] == 1
+    dis_index = df[dis_mask]['full cycle'].unique()
+    summary_df.loc[dis_index, 'Discharge Capacity'] = df[dis_mask].groupby('full cycle')['Capacity'].max()
+    cha_mask = df['state'] == 0
+    cha_index = df[cha_mask]['full cycle'].unique()
+    summary_df.loc[cha_index, 'Charge Capacity'] = df[cha_mask].groupby('full cycle')['Capacity'].max()
+    summary_df['CE'] = summary_df['Charge Capacity']/summary_df['Discharge Capacity']
+
+    def average_voltage(capacity, voltage):
+        return np.trapz(voltage, capacity)/max(capacity)
+
+    for cycle in df.loc[df.index[dis_mask]]['half cycle'].unique():
+        mask = df['half cycle'] == cycle
+        summary_df.loc[np.ceil(cycle/2), 'Average Discharge Voltage'] = average_voltage(df['Capacity'][mask], df['Voltage'][mask])
+    for cycle in df.loc[df.index[cha_mask]]['half cycle'].unique():
+        mask = df['half cycle'] == cycle
+        summary_df.loc[np.ceil(cycle/2), 'Average Charge Voltage'] = average_voltage(df['Capacity'][mask], df['Voltage'][mask])
+    return summary_df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+
+def main(n_rows, cycle_counts):
+    print(f"{n_rows} rows")
+    print(f"{'cycles':>8} {'legacy / s':>12} {'single pass / s':>16} {'speed-up':>10}")
+    for n_cycles in cycle_counts:
+        df = synthetic_frame(n_rows, n_cycles)
+        t_legacy, legacy = timed(legacy_cycle_summary, df)
+        t_new, new = min(timed(ec.cycle_summary, df) for _ in range(3))
+        pd.testing.assert_frame_equal(legacy, new, check_names=False, rtol=1e-9)
+        print(f"{n_cycles:>8} {t_legacy:>12.4f} {t_new:>16.4f} {t_legacy / t_new:>9.0f}x")
+
+
+if __name__ == '__main__':
+    args = [int(float(arg)) for arg in sys.argv[1:]]
+    main(args[0] if args else 200_000, args[1:] or [10, 100, 1000, 2000])
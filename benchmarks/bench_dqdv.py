@@ -0,0 +1,52 @@
+"""
+Benchmark of dQ/dV over many half cycles: one dqdv_single_cycle call per cycle (as multi_dqdv_plot used to do),
+the batched dqdv_cycles, and dqdv_cycles spread over a process pool.
+
+Run from the repository root with:
+    python benchmarks/bench_dqdv.py [n_cycles] [n_jobs]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+import navani.echem as ec
+from common import synthetic_frame
+
+KWARGS = dict(window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=251, polyorder_2=5)
+
+
+def per_cycle(df, cycles):
+    results = []
+    for cycle in cycles:
+        df_cycle = df[df['half cycle'] == cycle]
+        results.append(ec.dqdv_single_cycle(df_cycle['Capacity'], df_cycle['Voltage'], **KWARGS))
+    return results
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main(n_cycles, n_jobs):
+    df = synthetic_frame(2000 * n_cycles, n_cycles)
+    cycles = list(range(1, 2 * n_cycles + 1))
+    t_loop, loop = timed(per_cycle, df, cycles)
+    t_batch, batch = timed(ec.dqdv_cycles, df, cycles, **KWARGS)
+    t_parallel, parallel = timed(ec.dqdv_cycles, df, cycles, n_jobs=n_jobs, **KWARGS)
+    for serial_array, parallel_array in zip(batch, parallel):
+        np.testing.assert_array_equal(serial_array, parallel_array)
+    np.testing.assert_allclose(np.stack([result[1] for result in loop]), batch[1])
+
+    print(f"{len(cycles)} half cycles of {len(df) // len(cycles)} points")
+    print(f"dqdv_single_cycle loop: {t_loop:.2f} s")
+    print(f"dqdv_cycles:            {t_batch:.2f} s")
+    print(f"dqdv_cycles n_jobs={n_jobs}:   {t_parallel:.2f} s")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 100, args[1] if len(args) > 1 else (os.cpu_count() or 1))
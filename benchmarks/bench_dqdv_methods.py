@@ -0,0 +1,53 @@
+"""
+Accuracy and speed of the dQ/dV methods on the example files. The 'finite_difference' and 'histogram' curves are compared with the
+'spline' curve of the same half cycles by their relative L2 difference, ignoring the 5% of the voltage range at each end where the
+filters and spline are least reliable.
+
+Run from the repository root with:
+    python benchmarks/bench_dqdv_methods.py
+"""
+import os
+import time
+
+import numpy as np
+
+import navani.echem as ec
+from common import example_dir
+
+files = ['jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr', 'bs542_004_gr_li_50ua_50mv_1v_191020_Channel_11.xlsx']
+
+spline_kwargs = dict(window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=51, polyorder_2=5)
+methods = {'finite_difference': dict(window_size_1=51, polyorder_1=5),
+           # Bins of about two points each with light smoothing
+           'histogram': dict(window_size_1=7, polyorder_1=3)}
+
+
+def relative_difference(x, dqdv, reference_x, reference):
+    inner = slice(len(x) // 20, -(len(x) // 20))
+    reference = np.interp(x, reference_x, reference)[inner]
+    return np.linalg.norm(dqdv[inner] - reference) / np.linalg.norm(reference)
+
+
+def timed(*args, **kwargs):
+    start = time.perf_counter()
+    result = ec.dqdv_cycles(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'file':>55} {'method':>18} {'half cycles':>12} {'difference':>11} {'time / s':>9} {'spline / s':>11}")
+    for name in files:
+        df = ec.echem_file_loader(os.path.join(example_dir, name))
+        counts = df.groupby('half cycle').size()
+        cycles = [cycle for cycle in counts.index if cycle > 0 and counts[cycle] > 1000][:6]
+        points = int(counts[cycles].min())
+        t_spline, (reference_x, reference, _) = timed(df, cycles, **spline_kwargs)
+        for method, kwargs in methods.items():
+            num_points = points // 2 if method == 'histogram' else int(1e4)
+            t_method, (x, dqdv, _) = timed(df, cycles, method=method, num_points=num_points, **kwargs)
+            difference = np.median([relative_difference(x[i], dqdv[i], reference_x[i], reference[i]) for i in range(len(cycles))])
+            print(f"{name:>55} {method:>18} {len(cycles):>12} {difference:>11.1%} {t_method:>9.3f} {t_spline:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
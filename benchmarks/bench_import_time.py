@@ -0,0 +1,44 @@
+"""
+Benchmark of the time taken by `import navani.echem` in a fresh interpreter, as paid by every worker process or batch job.
+The import of numpy and pandas alone is timed as the floor, and the optional heavy modules that importing navani pulled in are listed
+(the plotting, dQ/dV and file format backends should only be imported when they are first used).
+
+Run from the repository root with:
+    python benchmarks/bench_import_time.py [repeat]
+"""
+import os
+import subprocess
+import sys
+
+heavy_modules = ['matplotlib', 'scipy', 'galvani', 'NewareNDA', 'sqlite3', 'pyarrow']
+
+timing_script = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+print(' '.join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def time_import(statement, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', timing_script.format(statement=statement, heavy_modules=heavy_modules)],
+                                capture_output=True, text=True, check=True, env=env).stdout.splitlines()
+        times.append(float(output[0]))
+    return sorted(times), output[1] if len(output) > 1 else ''
+
+
+def main(repeat):
+    print(f"{'statement':>55} {'best / ms':>10} {'median / ms':>12}  heavy modules imported")
+    for statement in ['import numpy, pandas',
+                      'import navani.echem',
+                      'import navani.echem; import matplotlib.pyplot, scipy.signal']:
+        times, modules = time_import(statement, repeat)
+        print(f"{statement:>55} {times[0] * 1e3:>10.1f} {times[len(times) // 2] * 1e3:>12.1f}  {modules or '-'}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,61 @@
+"""
+Benchmark of multi_cycle_plot against the original implementation, which masked the whole frame once per half cycle
+and added one ax.plot line per half cycle, for a fixed number of rows and an increasing number of cycles.
+The new implementation is timed drawing every point (max_points=None) and with the default min/max decimation of long half cycles.
+The times include drawing the figure with the Agg backend.
+
+Run from the repository root with:
+    python benchmarks/bench_plotting.py [n_rows] [n_cycles ...]
+"""
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+import numpy as np
+
+import navani.echem as ec
+from common import synthetic_frame
+
+
+def legacy_multi_cycle_plot(df, cycles, colormap='viridis'):
+    fig, ax = plt.subplots()
+    cm = plt.get_cmap(colormap)
+    norm = Normalize(vmin=int(np.ceil(min(cycles)/2)), vmax=int(np.ceil(max(cycles)/2)))
+    sm = plt.cm.ScalarMappable(cmap=cm, norm=norm)
+    for cycle in cycles:
+        mask = df['half cycle'] == cycle
+        ax.plot(df['Capacity'][mask], df['Voltage'][mask], color=cm(norm(np.ceil(cycle/2))))
+    fig.colorbar(sm, ax=ax)
+    return fig, ax
+
+
+def timed_plot(func, df, cycles, **kwargs):
+    start = time.perf_counter()
+    fig, _ = func(df, cycles, **kwargs)
+    built = time.perf_counter() - start
+    fig.canvas.draw()
+    total = time.perf_counter() - start
+    plt.close(fig)
+    return built, total
+
+
+def main(n_rows, cycle_counts):
+    print(f"{n_rows} rows")
+    print(f"{'cycles':>8} {'loop build / s':>15} {'loop total / s':>15} {'collection build / s':>21} {'collection total / s':>21}"
+          f" {'decimated build / s':>20} {'decimated total / s':>20}")
+    for n_cycles in cycle_counts:
+        df = synthetic_frame(n_rows, n_cycles)
+        cycles = list(range(1, 2 * n_cycles + 1))
+        legacy = timed_plot(legacy_multi_cycle_plot, df, cycles)
+        new = timed_plot(ec.multi_cycle_plot, df, cycles, max_points=None)
+        decimated = timed_plot(ec.multi_cycle_plot, df, cycles)
+        print(f"{n_cycles:>8} {legacy[0]:>15.3f} {legacy[1]:>15.3f} {new[0]:>21.3f} {new[1]:>21.3f}"
+              f" {decimated[0]:>20.3f} {decimated[1]:>20.3f}")
+
+
+if __name__ == '__main__':
+    args = [int(float(arg)) for arg in sys.argv[1:]]
+    main(args[0] if args else 500_000, args[1:] or [10, 100, 1000, 2000])
@@ -0,0 +1,74 @@
+"""
+Benchmark of reading the Channel_Normal_Table of a converted Arbin .res file: the original SELECT * with fetchall()
+and DataFrame.from_records against the chunked _read_sql_columns, comparing time and peak Python memory.
+
+Run from the repository root with:
+    python benchmarks/bench_sqlite_reader.py [n_rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import navani.echem as ec
+
+
+def make_table(path, n_rows):
+    rng = np.random.default_rng(0)
+    table = pd.DataFrame({
+        'Data_Point': np.arange(n_rows),
+        'Test_Time': np.arange(n_rows, dtype=float),
+        'Step_Time': np.arange(n_rows, dtype=float) % 3600,
+        'Step_Index': np.arange(n_rows) // 3600,
+        'Current': rng.normal(size=n_rows),
+        'Voltage': rng.uniform(3, 4, n_rows),
+        'Charge_Capacity': rng.uniform(0, 1, n_rows),
+        'Discharge_Capacity': rng.uniform(0, 1, n_rows),
+        'Charge_Energy': rng.uniform(0, 1, n_rows),
+        'Discharge_Energy': rng.uniform(0, 1, n_rows),
+    })
+    with sqlite3.connect(path) as connection:
+        table.to_sql('Channel_Normal_Table', connection, index=False)
+
+
+def fetchall(path):
+    with sqlite3.connect(path) as connection:
+        query = connection.execute("SELECT * From Channel_Normal_Table")
+        cols = [column[0] for column in query.description]
+        return pd.DataFrame.from_records(data=query.fetchall(), columns=cols)
+
+
+def chunked(path, columns=None):
+    with sqlite3.connect(path) as connection:
+        return ec._read_sql_columns(connection, 'Channel_Normal_Table', columns=columns)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def main(n_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'res.sqlite')
+        make_table(path, n_rows)
+        print(f"{n_rows} rows")
+        for label, func, args in [('fetchall', fetchall, ()),
+                                  ('chunked', chunked, ()),
+                                  ('chunked, navani columns', chunked, (['Data_Point', 'Current', 'Voltage', 'Charge_Capacity', 'Discharge_Capacity'],))]:
+            seconds, peak = measure(func, path, *args)
+            print(f"{label:>24}: {seconds:6.2f} s, peak {peak:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,77 @@
+"""
+Benchmark of the state and half cycle labelling used by all of the cycler processors.
+Compares the array based label_state/label_cycles against the original per-row Series.map implementation
+and checks that both give identical labels.
+
+Run from the repository root with:
+    python benchmarks/bench_state_labelling.py [n_rows ...]
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import navani.echem as ec
+
+
+def synthetic_current(n_rows, points_per_step=500, seed=0):
+    """
+    Square wave current of charge, rest, discharge, rest steps with some noise on the magnitude.
+    """
+    rng = np.random.default_rng(seed)
+    step = (np.arange(n_rows) // points_per_step) % 4
+    sign = np.select([step == 0, step == 2], [1.0, -1.0], 0.0)
+    return pd.Series(sign * rng.uniform(0.5, 1.5, n_rows))
+
+
+def legacy_labels(current):
+    """
+    The per-row implementation the processors used before label_state and label_cycles.
+    """
+    def state(x):
+        if x > 0:
+            return 0
+        elif x < 0:
+            return 1
+        elif x == 0:
+            return 'R'
+        else:
+            raise ValueError('Unexpected value in current - not a number')
+
+    df = pd.DataFrame({'Current': current})
+    df['state'] = df['Current'].map(lambda x: state(x))
+    not_rest_idx = df[df['state'] != 'R'].index
+    df['cycle change'] = False
+    df.loc[not_rest_idx, 'cycle change'] = df.loc[not_rest_idx, 'state'].ne(df.loc[not_rest_idx, 'state'].shift())
+    df['half cycle'] = (df['cycle change'] == True).cumsum()
+    return df
+
+
+def vectorised_labels(current):
+    df = pd.DataFrame({'Current': current})
+    df['state'] = ec.label_state(df['Current'])
+    df['cycle change'], df['half cycle'] = ec.label_cycles(df['state'])
+    return df
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'legacy / s':>12} {'vectorised / s':>15} {'speed-up':>10} {'state MB (object -> category)':>32}")
+    for n_rows in sizes:
+        current = synthetic_current(n_rows)
+        legacy = legacy_labels(current)
+        new = vectorised_labels(current)
+        assert legacy['state'].tolist() == new['state'].astype(object).tolist()
+        assert legacy['cycle change'].tolist() == new['cycle change'].tolist()
+        assert legacy['half cycle'].tolist() == new['half cycle'].tolist()
+
+        number = 1 if n_rows >= 1e6 else 3
+        t_legacy = min(timeit.repeat(lambda: legacy_labels(current), number=number, repeat=3)) / number
+        t_new = min(timeit.repeat(lambda: vectorised_labels(current), number=number, repeat=3)) / number
+        mem_legacy = legacy['state'].memory_usage(deep=True, index=False) / 1e6
+        mem_new = new['state'].memory_usage(deep=True, index=False) / 1e6
+        print(f"{n_rows:>10} {t_legacy:>12.4f} {t_new:>15.4f} {t_legacy / t_new:>9.1f}x {mem_legacy:>15.1f} -> {mem_new:.1f}")
+
+
+if __name__ == '__main__':
+    main([int(float(arg)) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
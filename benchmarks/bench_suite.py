@@ -0,0 +1,157 @@
+"""
+Benchmark suite timing echem_file_loader for every supported format and the analysis and plotting functions,
+with the peak memory allocated by each case (as traced by tracemalloc, so memory held by native parsers such as mdbtools
+or NewareNDA's readers outside numpy and Python is not included).
+
+Loaders are timed on the files in Example_data, plus navani .csv and Ivium .txt files written from scaled copies of an example file.
+cycle_summary, dqdv_single_cycle, dqdv_cycles and the plotting functions are timed on scaled copies of an example file
+for each combination of row and cycle counts, to give scaling curves. Cases whose optional dependency is missing are reported as skipped.
+
+Results can be saved with --json and compared with a previous run with --compare, which flags cases that became slower than --threshold.
+
+Run from the repository root with:
+    python benchmarks/bench_suite.py [--rows 1e6 1e7 ...] [--cycles 10 5000 ...] [--repeat 3] [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import navani.echem as ec
+from common import example_dir, example_path, scaled_example
+
+example_files = ['jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr', 'arbin_example.res',
+                 'bs542_004_gr_li_50ua_50mv_1v_191020_Channel_11.xlsx', 'test.nda', 'test.ndax']
+
+# Half cycles used for the dQ/dV and plotting cases that do not take every cycle
+dqdv_cycles = 20
+
+
+def measure(func, repeat):
+    """
+    Best wall time of repeat calls, then the peak traced memory of one more call, which is run separately as tracing slows it down.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def plotted(plot):
+    def run():
+        fig, _ = plot()
+        fig.canvas.draw()
+        plt.close(fig)
+    return run
+
+
+def loader_cases(tmp_dir, sizes):
+    cases = [(f'load {os.path.splitext(name)[1]}', name, lambda path=os.path.join(example_dir, name): ec.echem_file_loader(path))
+             for name in example_files]
+    for n_rows, n_cycles in sizes:
+        df = scaled_example(n_rows, n_cycles)
+        csv_path = os.path.join(tmp_dir, f'scaled_{n_rows}_{n_cycles}.csv')
+        ec.echem_file_writer(df, csv_path)
+        txt_path = os.path.join(tmp_dir, f'scaled_{n_rows}_{n_cycles}.txt')
+        df.rename(columns={'Time': 'time /s', 'Current': 'I /mA', 'Voltage': 'E /V'})[['time /s', 'I /mA', 'E /V']].to_csv(txt_path, sep='\t', index=False)
+        size = f'{n_rows} rows, {n_cycles} cycles'
+        cases.append(('load .csv', size, lambda path=csv_path: ec.echem_file_loader(path)))
+        cases.append(('load .txt', size, lambda path=txt_path: ec.echem_file_loader(path)))
+    return cases
+
+
+def analysis_cases(sizes):
+    for n_rows, n_cycles in sizes:
+        df = scaled_example(n_rows, n_cycles)
+        df.cycles.rebuild()
+        size = f'{n_rows} rows, {n_cycles} cycles'
+        cycles = list(range(1, min(dqdv_cycles, 2 * n_cycles) + 1))
+        first = df.cycles.get_cycle(1)
+        yield 'cycle_summary', size, lambda df=df: ec.cycle_summary(df)
+        yield 'dqdv_single_cycle', size, lambda first=first: ec.dqdv_single_cycle(first['Capacity'], first['Voltage'])
+        yield f'dqdv_cycles ({len(cycles)} half cycles)', size, lambda df=df, cycles=cycles: ec.dqdv_cycles(df, cycles)
+        yield f'multi_dqdv_plot ({len(cycles)} half cycles)', size, plotted(lambda df=df, cycles=cycles: ec.multi_dqdv_plot(df, cycles))
+        yield 'charge_discharge_plot (3 cycles)', size, plotted(lambda df=df: ec.charge_discharge_plot(df, [1, 2, 3]))
+        yield 'multi_cycle_plot (all cycles)', size, plotted(lambda df=df, n_cycles=n_cycles: ec.multi_cycle_plot(df, range(1, 2 * n_cycles + 1)))
+
+
+def run_case(name, size, func, repeat):
+    try:
+        seconds, peak = measure(func, repeat)
+    except (ImportError, RuntimeError, OSError) as e:
+        # Missing optional dependencies, e.g. mdbtools for .res files
+        print(f"{name:>42} {size:>52} {'skipped: ' + str(e).splitlines()[0][:60]}")
+        return None
+    print(f"{name:>42} {size:>52} {seconds:>10.3f} {peak / 1024**2:>12.1f}")
+    return {'name': name, 'size': size, 'seconds': seconds, 'peak_bytes': peak}
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {(case['name'], case['size']): case for case in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'case':>42} {'size':>52} {'time ratio':>11} {'memory ratio':>13}")
+    regressions = 0
+    for case in results:
+        previous = baseline.get((case['name'], case['size']))
+        if previous is None:
+            continue
+        time_ratio = case['seconds'] / previous['seconds']
+        memory_ratio = case['peak_bytes'] / max(previous['peak_bytes'], 1)
+        flag = '  slower' if time_ratio > 1 + threshold else ''
+        regressions += bool(flag)
+        print(f"{case['name']:>42} {case['size']:>52} {time_ratio:>11.2f} {memory_ratio:>13.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e5, 1e6], help='Row counts of the scaled data (e.g. 1e6 1e7 1e8)')
+    parser.add_argument('--cycles', type=int, nargs='+', default=[10, 100], help='Full cycle counts of the scaled data (e.g. 10 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed calls of each case, the best is reported')
+    parser.add_argument('--skip-loaders', action='store_true', help='Only run the analysis and plotting cases')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Fractional slowdown reported as a regression by --compare')
+    args = parser.parse_args(argv)
+
+    sizes = [(int(n_rows), n_cycles) for n_rows in args.rows for n_cycles in args.cycles]
+    print(f"Example file {os.path.basename(example_path)} scaled to {', '.join(f'{n} rows/{c} cycles' for n, c in sizes)}\n")
+    print(f"{'case':>42} {'data':>52} {'best / s':>10} {'peak / MiB':>12}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = [] if args.skip_loaders else loader_cases(tmp_dir, sizes)
+        for name, size, func in cases:
+            results.append(run_case(name, size, func, args.repeat))
+        for name, size, func in analysis_cases(sizes):
+            results.append(run_case(name, size, func, args.repeat))
+    results = [case for case in results if case is not None]
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=1)
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import navani.echem as ec
+
+example_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Example_data')
+example_path = os.path.join(example_dir, 'jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr')
+
+
+def synthetic_frame(n_rows, n_cycles, seed=0):
+    """
+    Processed frame of alternating charge and discharge half cycles, each followed by a short rest.
+    Has the navani Current, Voltage, Capacity, state and half cycle columns plus the raw change in capacity dQ.
+    """
+    rng = np.random.default_rng(seed)
+    half = np.arange(n_rows) * (2 * n_cycles) // n_rows
+    position = np.arange(n_rows) - np.searchsorted(half, half)
+    length = np.bincount(half)[half]
+    current = np.where(half % 2 == 0, 1.0, -1.0)
+    current[position > 0.9 * length] = 0.0
+    df = pd.DataFrame({'Current': current, 'dQ': np.abs(current) * rng.uniform(0.9, 1.1, n_rows)})
+    df['Capacity'] = df['dQ'].cumsum()
+    df['state'] = ec.label_state(df['Current'])
+    df['cycle change'], df['half cycle'] = ec.label_cycles(df['state'])
+    df['Capacity'] = ec.zero_by_half_cycle(df['Capacity'], df['half cycle'], mask=df['state'] != 'R')
+    fraction = np.minimum(position / (0.9 * length), 1)
+    df['Voltage'] = np.where(half % 2 == 0, 3 + fraction, 4 - fraction) + rng.normal(0, 1e-3, n_rows)
+    return df
+
+
+def scaled_example(n_rows, n_cycles, filepath=example_path, template=(2, 3), seed=0):
+    """
+    Processed frame with the shape of a real charge and discharge, scaled to n_rows rows and n_cycles full cycles.
+    The two template half cycles of the example file are interpolated onto each half cycle's share of the rows and alternated,
+    with a little voltage noise, then labelled as navani would.
+    Has the Time, Current, Voltage, Capacity, state, half cycle and full cycle columns.
+    """
+    rng = np.random.default_rng(seed)
+    source = ec.echem_file_loader(filepath)
+    curves = []
+    for cycle in template:
+        rows = source.cycles.get_cycle(cycle)
+        rows = rows[rows['state'] != 'R']
+        curves.append({'time': (rows['Time'] - rows['Time'].iloc[0]).to_numpy(), 'current': rows['Current'].mean(),
+                       'capacity': rows['Capacity'].to_numpy(), 'voltage': rows['Voltage'].to_numpy()})
+
+    half = np.arange(n_rows) * (2 * n_cycles) // n_rows
+    starts = np.searchsorted(half, np.arange(2 * n_cycles))
+    lengths = np.diff(np.append(starts, n_rows))
+    fraction = (np.arange(n_rows) - starts[half]) / np.maximum(lengths[half] - 1, 1)
+    first = half % 2 == 0
+
+    columns = {}
+    for label in ['time', 'capacity', 'voltage']:
+        columns[label] = np.empty(n_rows)
+        for curve, mask in [(curves[0], first), (curves[1], ~first)]:
+            columns[label][mask] = np.interp(fraction[mask], np.linspace(0, 1, len(curve[label])), curve[label])
+    durations = np.where(np.arange(2 * n_cycles) % 2 == 0, curves[0]['time'][-1], curves[1]['time'][-1])
+    offsets = np.append(0, np.cumsum(durations)[:-1])
+
+    df = pd.DataFrame({'Time': offsets[half] + columns['time'],
+                       'Current': np.where(first, curves[0]['current'], curves[1]['current']),
+                       'Voltage': columns['voltage'] + rng.normal(0, 1e-4, n_rows),
+                       'Capacity': columns['capacity']})
+    df['state'] = ec.label_state(df['Current'])
+    df['cycle change'], df['half cycle'] = ec.label_cycles(df['state'])
+    df['full cycle'] = np.ceil(df['half cycle'] / 2)
+    return df
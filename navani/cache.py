@@ -0,0 +1,182 @@
+"""
+On-disk cache of processed dataframes, used by echem_file_loader when it is given a cache directory.
+
+Each entry is an uncompressed Feather file (written through the same Arrow conversion as echem_file_writer, so pyarrow is required)
+named by a hash of the source file's path, size and modification time, the cache format, the navani version and source code,
+and the loader arguments, so changing any of these gives a new entry. Entries are plain data, so reading them never runs code
+from the cache directory. The cache directory is kept under a maximum size by removing the least recently used entries.
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from importlib.metadata import version, PackageNotFoundError
+
+# Default maximum size of a cache directory in bytes
+default_max_bytes = 10 * 1024**3
+
+extension = '.feather'
+
+# Version of the layout of cache entries, increased whenever it changes so older entries are not read
+cache_format = 2
+
+
+def navani_version():
+    """
+    The installed version of navani, or 'unknown' when running from a source tree that is not installed.
+    """
+    try:
+        return version('navani')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def check_pyarrow():
+    """
+    Raises an ImportError naming the extra to install if pyarrow, which the cache entries are written with, is not available.
+    """
+    try:
+        import pyarrow.feather  # noqa: F401
+    except ImportError as e:
+        raise ImportError('The on-disk cache (cache_dir) requires pyarrow, install it with: pip install navani[arrow]') from e
+
+
+@functools.lru_cache(maxsize=None)
+def source_hash():
+    """
+    A hash of the source code of the navani package, so entries processed by a different (e.g. development) version are not used
+    even when the version number has not changed.
+    """
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(package_dir, name), 'rb') as f:
+                digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def cache_key(filepath, **options):
+    """
+    Builds the cache key for a file loaded with the given loader options.
+
+    Args:
+        filepath (str): The path to the file being loaded.
+        **options: The loader arguments that change the processed dataframe, e.g. mass and area.
+
+    Returns:
+        str: A hex digest identifying the file and options.
+    """
+    stat = os.stat(filepath)
+    key = {'path': os.path.abspath(filepath),
+           'size': stat.st_size,
+           'mtime': stat.st_mtime_ns,
+           'format': cache_format,
+           'version': navani_version(),
+           'source': source_hash(),
+           'options': options}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load(cache_dir, key):
+    """
+    Loads a dataframe from the cache, marking it as recently used.
+
+    Args:
+        cache_dir (str): The cache directory.
+        key (str): The cache key from cache_key.
+
+    Returns:
+        pandas.DataFrame: The cached dataframe, or None if there is no (readable) entry for the key.
+    """
+    import pyarrow.feather as feather
+    from navani.echem import _arrow_frame
+
+    path = os.path.join(os.path.expanduser(cache_dir), key + extension)
+    try:
+        df, metadata = _arrow_frame(feather.read_table(path))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError):
+        # Entries left incomplete or corrupted are discarded
+        _remove(path)
+        return None
+    df.attrs = metadata.get('attrs', {})
+    os.utime(path)
+    return df
+
+
+def store(cache_dir, key, df, max_bytes=default_max_bytes):
+    """
+    Stores a dataframe in the cache and then removes the least recently used entries until the cache fits in max_bytes.
+    A dataframe that Arrow cannot store, e.g. with a column of mixed types, is not cached.
+
+    Args:
+        cache_dir (str): The cache directory, created if it does not exist.
+        key (str): The cache key from cache_key.
+        df (pandas.DataFrame): The dataframe to store.
+        max_bytes (int, optional): Maximum size of the cache directory. Defaults to 10 GiB. None for no limit.
+    """
+    import pyarrow.feather as feather
+    from navani.echem import _arrow_table
+
+    try:
+        table = _arrow_table(df, {'attrs': df.attrs})
+    except (TypeError, ValueError) as e:
+        print(f'Warning: dataframe not cached, {type(e).__name__}: {e}')
+        return
+    cache_dir = os.path.expanduser(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so other processes never read a partly written entry
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, os.path.join(cache_dir, key + extension))
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    if max_bytes is not None:
+        evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir, max_bytes):
+    """
+    Removes the least recently used entries until the total size of the cache is at most max_bytes.
+
+    Args:
+        cache_dir (str): The cache directory.
+        max_bytes (int): Maximum size of the cache directory.
+
+    Returns:
+        int: The number of bytes removed.
+    """
+    entries = []
+    for entry in os.scandir(os.path.expanduser(cache_dir)):
+        if entry.name.endswith(extension) and entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total - removed <= max_bytes:
+            break
+        _remove(path)
+        removed += size
+    return removed
+
+
+def clear(cache_dir):
+    """
+    Removes every entry from the cache directory.
+    """
+    evict(cache_dir, 0)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,169 @@
+"""
+Opt-in profiling of the stages of echem_file_loader, cycle_summary and the dQ/dV functions.
+
+Inside a profile() block every instrumented stage records its wall time, the number of rows it processed and,
+if memory tracing is on, the change in traced memory and its peak. Stages nest, e.g. the processing function
+of a reader runs inside the reader's stage, and each record keeps the time not spent in nested stages as its self time.
+
+    with profiling.profile() as report:
+        df = ec.echem_file_loader(filepath)
+    report.to_frame()
+
+Records are only kept for stages run in the calling process, work sent to other processes is recorded as a single stage.
+Outside a profile() block the stages cost a context variable lookup.
+"""
+import contextvars
+import functools
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+_active = contextvars.ContextVar('navani_profile', default=None)
+
+
+class Profile:
+    """
+    The records of a profile() block, in the order the stages finished.
+    Each record is a dict with the stage name, its path of enclosing stages, depth, seconds, self seconds, rows,
+    and memory delta and memory peak in bytes (None without memory tracing).
+
+    Args:
+        memory (bool, optional): Whether the memory of each stage is traced with tracemalloc. Defaults to True.
+        hook (callable, optional): Called with each record as its stage finishes, e.g. to send it to a metrics system. Defaults to None.
+    """
+    def __init__(self, memory=True, hook=None):
+        self.memory = memory
+        self.hook = hook
+        self.records = []
+        self._stack = []
+
+    def to_frame(self):
+        """
+        The records as a dataframe with one row per stage.
+        """
+        columns = ['stage', 'path', 'depth', 'seconds', 'self seconds', 'rows', 'memory delta', 'memory peak']
+        return pd.DataFrame(self.records, columns=columns)
+
+    def summary(self):
+        """
+        The total calls, seconds, self seconds and rows of each stage name, slowest first by self seconds.
+        """
+        df = self.to_frame()
+        summary = df.groupby('stage').agg(calls=('stage', 'size'), seconds=('seconds', 'sum'),
+                                          self_seconds=('self seconds', 'sum'), rows=('rows', 'sum'))
+        return summary.rename(columns={'self_seconds': 'self seconds'}).sort_values('self seconds', ascending=False)
+
+    def _enter(self, name):
+        frame = {'stage': name, 'path': '/'.join([parent['stage'] for parent in self._stack] + [name]), 'depth': len(self._stack),
+                 'rows': None, 'child seconds': 0.0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # The peak is reset for each stage, so the enclosing stage keeps the highest peak seen so far
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['memory start'] = frame['peak'] = current
+        self._stack.append(frame)
+        frame['start'] = time.perf_counter()
+        return frame
+
+    def _exit(self, frame):
+        seconds = time.perf_counter() - frame['start']
+        self._stack.pop()
+        record = {'stage': frame['stage'], 'path': frame['path'], 'depth': frame['depth'], 'seconds': seconds,
+                  'self seconds': seconds - frame['child seconds'], 'rows': frame['rows'], 'memory delta': None, 'memory peak': None}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['peak'], peak)
+            record['memory delta'] = current - frame['memory start']
+            record['memory peak'] = peak - frame['memory start']
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+        if self._stack:
+            self._stack[-1]['child seconds'] += seconds
+        self.records.append(record)
+        if self.hook is not None:
+            self.hook(record)
+
+
+class profile:
+    """
+    Context manager that records the stages run inside it, returning the Profile as the target of the with statement.
+    Memory tracing starts tracemalloc if it is not already running, which slows allocation heavy stages down a little.
+
+    Args:
+        memory (bool, optional): Whether the memory of each stage is traced with tracemalloc. Defaults to True.
+        hook (callable, optional): Called with each record as its stage finishes. Defaults to None.
+    """
+    def __init__(self, memory=True, hook=None):
+        self.report = Profile(memory=memory, hook=hook)
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.report.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _active.set(self.report)
+        return self.report
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+        return False
+
+
+class stage:
+    """
+    Context manager for a stage of work, recorded if a profile() block is active. The number of rows processed can be set
+    on the target of the with statement:
+
+        with profiling.stage('read') as record:
+            df = read(filepath)
+            record['rows'] = len(df)
+    """
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._report = _active.get()
+        if self._report is None:
+            return {}
+        self._frame = self._report._enter(self.name)
+        self._frame['rows'] = self.rows
+        return self._frame
+
+    def __exit__(self, *exc_info):
+        if self._report is not None:
+            self._report._exit(self._frame)
+        return False
+
+
+def profiled(name=None):
+    """
+    Decorator recording each call of a function as a stage, named after the function by default.
+    The rows are the length of the first argument when it is array-like, otherwise the length of the returned dataframe.
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            report = _active.get()
+            if report is None:
+                return func(*args, **kwargs)
+            frame = report._enter(stage_name)
+            try:
+                if args and hasattr(args[0], '__len__') and not isinstance(args[0], (str, bytes, os.PathLike)):
+                    frame['rows'] = len(args[0])
+                result = func(*args, **kwargs)
+                if frame['rows'] is None and isinstance(result, pd.DataFrame):
+                    frame['rows'] = len(result)
+                return result
+            finally:
+                report._exit(frame)
+        return wrapper
+    return decorator
@@ -0,0 +1,193 @@
+"""
+Synthetic galvanostatic cycling data, for stress testing and profiling the loaders and analysis at sizes beyond the example files.
+
+generate_cycling builds a test of constant current charges and discharges with optional constant voltage holds, rests,
+noise and capacity fade. raw_layout converts it to the raw columns of a cycler format as read from file, ready for the
+matching processing function in navani.echem, and write_synthetic writes it to a file echem_file_loader can read.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import navani.echem as ec
+
+# Steps of each cycle, in order, named as NewareNDA names them
+steps = ['CC_Chg', 'CV_Chg', 'Rest', 'CC_DChg', 'Rest']
+
+# Rows of data in each sheet of an Excel file, leaving a row for the header
+excel_max_rows = 1_048_575
+
+# Raw layouts accepted by raw_layout and the navani.echem function that processes each of them
+layouts = {'biologic': 'biologic_processing',
+           'biologic_dq': 'biologic_processing',
+           'arbin_res': 'arbin_res',
+           'arbin_excel': 'arbin_excel',
+           'ivium': 'ivium_processing',
+           'neware': 'neware_processing',
+           'navani': None}
+
+
+def generate_cycling(n_rows=100_000, n_cycles=10, capacity=1.0, c_rate=0.5, voltage_window=(3.0, 4.2), overpotential=0.05,
+                     cv_time=0, rest_time=600, fade=0.0, noise=1e-3, current_noise=0.0, seed=None):
+    """
+    Generates a galvanostatic cycling test. Each cycle is a constant current charge, an optional constant voltage hold,
+    a rest, a constant current discharge and another rest. The rows are spread evenly in time over each cycle, so every
+    step gets a share of the rows in proportion to its duration.
+
+    Args:
+        n_rows (int, optional): Number of data points. Defaults to 100000.
+        n_cycles (int, optional): Number of full cycles. Defaults to 10.
+        capacity (float, optional): Capacity of the first charge in mAh. Defaults to 1.0.
+        c_rate (float, optional): Charge and discharge current as a fraction of the first cycle's capacity per hour. Defaults to 0.5.
+        voltage_window (tuple, optional): Lower and upper cut-off voltages in V. Defaults to (3.0, 4.2).
+        overpotential (float, optional): Voltage added on charge and removed on discharge, relaxing during rests. Defaults to 0.05.
+        cv_time (float, optional): Duration of the constant voltage hold after each charge in seconds, 0 for none. Defaults to 0.
+        rest_time (float, optional): Duration of the rests after each charge and discharge in seconds, 0 for none. Defaults to 600.
+        fade (float, optional): Fraction of the capacity lost each cycle. Defaults to 0.
+        noise (float, optional): Standard deviation of the voltage noise in V. Defaults to 1e-3.
+        current_noise (float, optional): Standard deviation of the current noise relative to the current. Defaults to 0.
+        seed (int, optional): Seed of the random number generator. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The test with columns Time (s), Current (mA), Voltage (V), step (one of steps) and cycle.
+    """
+    if n_rows < len(steps) * n_cycles:
+        raise ValueError(f'n_rows must be at least {len(steps)} per cycle, got {n_rows} rows for {n_cycles} cycles')
+    rng = np.random.default_rng(seed)
+    current = capacity * c_rate
+    v_min, v_max = voltage_window
+
+    # Duration of each step of each cycle, the hold and rests are optional
+    cycle_capacity = capacity * (1 - fade) ** np.arange(n_cycles)
+    tau = cv_time / 3
+    cv_capacity = current * tau * (1 - np.exp(-3)) / 3600
+    durations = np.zeros((n_cycles, len(steps)))
+    durations[:, 0] = cycle_capacity / current * 3600
+    durations[:, 1] = cv_time
+    durations[:, [2, 4]] = rest_time
+    durations[:, 3] = (cycle_capacity + cv_capacity) / current * 3600
+    ends = np.cumsum(durations, axis=1)
+    offsets = np.append(0, np.cumsum(ends[:, -1])[:-1])
+
+    # Cycle of each row and its time from the start of the cycle
+    cycle = np.arange(n_rows) * n_cycles // n_rows
+    starts = np.searchsorted(cycle, np.arange(n_cycles))
+    lengths = np.diff(np.append(starts, n_rows))
+    elapsed = (np.arange(n_rows) - starts[cycle]) / lengths[cycle] * ends[cycle, -1]
+    step = (elapsed[:, None] >= ends[cycle]).sum(axis=1)
+    since = elapsed - np.where(step > 0, ends[cycle, np.maximum(step - 1, 0)], 0)
+    fraction = since / durations[cycle, step].clip(min=1e-12)
+
+    def ocv(soc):
+        # Logistic open circuit voltage between the cut-offs less the overpotential
+        s = 0.02 + 0.96 * np.clip(soc, 0, 1)
+        shape = (np.log(s / (1 - s)) - np.log(0.02 / 0.98)) / (2 * np.log(0.98 / 0.02))
+        return v_min + overpotential + (v_max - v_min - 2 * overpotential) * shape
+
+    relax = np.exp(-5 * fraction)
+    voltage = np.select([step == 0, step == 1, step == 2, step == 3],
+                        [ocv(fraction) + overpotential, ocv(1) + overpotential, ocv(1) + overpotential * relax, ocv(1 - fraction) - overpotential],
+                        ocv(0) - overpotential * relax)
+    amps = np.select([step == 0, step == 1, step == 3], [current, current * np.exp(-since / max(tau, 1e-12)), -current], 0.0)
+    if current_noise:
+        amps = np.where(amps != 0, amps * (1 + rng.normal(0, current_noise, n_rows)), 0.0)
+    if noise:
+        voltage = voltage + rng.normal(0, noise, n_rows)
+
+    return pd.DataFrame({'Time': offsets[cycle] + elapsed,
+                         'Current': amps,
+                         'Voltage': voltage,
+                         'step': pd.Categorical.from_codes(np.array([0, 1, 2, 3, 2])[step], categories=steps[:4]),
+                         'cycle': cycle + 1})
+
+
+def raw_layout(df, layout):
+    """
+    Converts a test from generate_cycling to the raw columns of a cycler format, as they are read from file.
+
+    Args:
+        df (pandas.DataFrame): The test from generate_cycling.
+        layout (str): One of layouts:
+            - 'biologic': time/s, Ewe/V, I/mA and Q charge/discharge/mA.h, which is reset at each half cycle
+            - 'biologic_dq': time/s, Ewe/V and dQ/mA.h
+            - 'arbin_res': Data_Point, Test_Time, Current and Voltage, with Charge_Capacity and Discharge_Capacity in Ah
+            - 'arbin_excel': Data_Point, Test_Time(s), Current(A), Voltage(V), Charge_Capacity(Ah) and Discharge_Capacity(Ah)
+            - 'ivium': time /s, I /mA and E /V
+            - 'neware': Index, Cycle, Status, Time, Voltage, Current(mA), Charge_Capacity(mAh) and Discharge_Capacity(mAh),
+              with the time and capacities reset at each step and the current in A as neware_processing expects
+            - 'navani': the columns of a dataframe processed by navani
+
+    Returns:
+        pandas.DataFrame: The raw columns.
+    """
+    time = df['Time'].to_numpy()
+    current = df['Current'].to_numpy()
+    voltage = df['Voltage'].to_numpy()
+    # Charge passed since the previous point in mAh
+    dq = current * np.diff(time, prepend=time[0] if len(time) else 0) / 3600
+
+    if layout in ('biologic', 'navani'):
+        state = ec.label_state(current)
+        _, half_cycle = ec.label_cycles(state)
+    if layout == 'biologic':
+        return pd.DataFrame({'time/s': time, 'Ewe/V': voltage, 'I/mA': current,
+                             'Q charge/discharge/mA.h': ec.cumsum_by_half_cycle(pd.Series(dq), half_cycle).to_numpy()})
+    if layout == 'biologic_dq':
+        return pd.DataFrame({'time/s': time, 'Ewe/V': voltage, 'dQ/mA.h': dq})
+    if layout in ('arbin_res', 'arbin_excel'):
+        raw = {'Data_Point': np.arange(1, len(df) + 1),
+               'Test_Time': time,
+               'Current': current / 1000,
+               'Voltage': voltage,
+               'Charge_Capacity': np.cumsum(np.clip(dq, 0, None)) / 1000,
+               'Discharge_Capacity': np.cumsum(np.clip(-dq, 0, None)) / 1000}
+        if layout == 'arbin_excel':
+            raw = {name + unit: values for (name, values), unit in zip(raw.items(), ['', '(s)', '(A)', '(V)', '(Ah)', '(Ah)'])}
+        return pd.DataFrame(raw)
+    if layout == 'ivium':
+        return pd.DataFrame({'time /s': time, 'I /mA': current, 'E /V': voltage})
+    if layout == 'neware':
+        step = df['step'].to_numpy()
+        step_number = np.cumsum(np.r_[True, (step[1:] != step[:-1]) | (df['cycle'].to_numpy()[1:] != df['cycle'].to_numpy()[:-1])])
+        step_start = np.searchsorted(step_number, step_number)
+        q = pd.Series(np.abs(dq)).groupby(step_number).cumsum().to_numpy()
+        return pd.DataFrame({'Index': np.arange(1, len(df) + 1),
+                             'Cycle': df['cycle'].to_numpy(),
+                             'Status': step,
+                             'Time': time - time[step_start],
+                             'Voltage': voltage,
+                             'Current(mA)': current / 1000,
+                             'Charge_Capacity(mAh)': np.where(current > 0, q, 0),
+                             'Discharge_Capacity(mAh)': np.where(current < 0, q, 0)})
+    if layout == 'navani':
+        processed = pd.DataFrame({'Time': time, 'Current': current, 'Voltage': voltage, 'state': state, 'half cycle': half_cycle})
+        processed['Capacity'] = ec.cumsum_by_half_cycle(pd.Series(np.abs(dq)), half_cycle).to_numpy()
+        processed['full cycle'] = np.ceil(processed['half cycle'] / 2).astype(int)
+        return processed
+    raise ValueError(f'Unknown layout {layout!r}, should be one of {list(layouts)}')
+
+
+def write_synthetic(df, filepath):
+    """
+    Writes a test from generate_cycling to a file that echem_file_loader can read, in the layout given by the extension:
+    an Ivium .txt, an Arbin .xlsx or a navani .csv, .parquet or .feather file.
+
+    Args:
+        df (pandas.DataFrame): The test from generate_cycling.
+        filepath (str): The path of the file to write.
+    """
+    extension = os.path.splitext(filepath)[-1].lower()
+    if extension == '.txt':
+        raw_layout(df, 'ivium').to_csv(filepath, sep='\t', index=False)
+    elif extension == '.xlsx':
+        # Arbin writes a Global_Info sheet and splits the data over Channel sheets that fit in Excel's row limit
+        raw = raw_layout(df, 'arbin_excel')
+        with pd.ExcelWriter(filepath) as writer:
+            pd.DataFrame({'Channel': [1], 'Schedule_File_Name': ['synthetic']}).to_excel(writer, sheet_name='Global_Info', index=False)
+            for sheet, start in enumerate(range(0, max(len(raw), 1), excel_max_rows), start=1):
+                raw.iloc[start:start + excel_max_rows].to_excel(writer, sheet_name=f'Channel_1_{sheet}', index=False)
+    elif extension in ('.csv', '.parquet', '.feather'):
+        ec.echem_file_writer(raw_layout(df, 'navani'), filepath)
+    else:
+        raise ValueError(f'Cannot write synthetic data to {extension} files, use .txt, .xlsx, .csv, .parquet or .feather')
@@ -16,6 +16,8 @@ setup(
     packages=['navani'],
     # Needed for dependencies
     install_requires=['numpy', 'pandas', 'scipy', 'galvani >= 0.4.1', 'matplotlib', 'openpyxl', 'NewareNDA'],
+    # Optional dependencies for reading and writing Parquet and Feather files, and faster Excel reading
+    extras_require={'arrow': ['pyarrow'], 'excel': ['python-calamine']},
     tests_require=['pytest'],
     # *strongly* suggested for sharing
     version='0.1.5',
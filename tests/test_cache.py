@@ -0,0 +1,84 @@
+import os
+import pathlib
+
+import pandas as pd
+import pytest
+
+
+def test_loader_cache_hit(tmp_path, monkeypatch):
+    import navani.echem as ec
+
+    pytest.importorskip("pyarrow")
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "00_test_04_MB_C01.mpr"
+    df = ec.echem_file_loader(test_path, mass=2.0, cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # A second load must come from the cache without reading the file
+    def fail(filepath, **kwargs):
+        raise AssertionError("file was parsed again")
+
+    monkeypatch.setattr(ec, "_read_file", fail)
+    cached = ec.echem_file_loader(test_path, mass=2.0, cache_dir=tmp_path)
+    pd.testing.assert_frame_equal(df, cached)
+
+    # Different loader arguments are a different entry
+    with pytest.raises(AssertionError, match="parsed again"):
+        ec.echem_file_loader(test_path, mass=3.0, cache_dir=tmp_path)
+
+
+def test_cache_entries_are_feather(tmp_path, monkeypatch):
+    import navani.echem as ec
+    from navani import cache
+
+    pytest.importorskip("pyarrow")
+    # A cache directory under ~ is expanded rather than created in the working directory
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path, compact=True, cache_dir="~/.cache/navani")
+    assert not (tmp_path / "~").exists()
+    (entry,) = os.listdir(tmp_path / ".cache" / "navani")
+    assert entry.endswith(".feather")
+    with open(tmp_path / ".cache" / "navani" / entry, "rb") as f:
+        assert f.read(6) == b"ARROW1"
+
+    cached = cache.load("~/.cache/navani", entry[:-len(cache.extension)])
+    pd.testing.assert_frame_equal(df, cached)
+    assert cached.attrs["memory saved"] == df.attrs["memory saved"]
+
+    # Changes to the navani source give a new key even when the version number is the same
+    key = cache.cache_key(test_path)
+    monkeypatch.setattr(cache, "source_hash", lambda: "changed")
+    assert cache.cache_key(test_path) != key
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    from navani import cache
+
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"Voltage": range(1000)})
+    for key in ("a", "b", "c"):
+        cache.store(tmp_path, key, df, max_bytes=None)
+        os.utime(tmp_path / f"{key}{cache.extension}", ns=(0, {"a": 1, "b": 2, "c": 3}[key] * 10**9))
+    entry_size = os.path.getsize(tmp_path / f"a{cache.extension}")
+
+    # Reading "a" marks it as recently used, so "b" is the first to go
+    assert cache.load(tmp_path, "a") is not None
+    cache.evict(tmp_path, 2 * entry_size)
+    assert sorted(os.listdir(tmp_path)) == [f"a{cache.extension}", f"c{cache.extension}"]
+
+    cache.clear(tmp_path)
+    assert os.listdir(tmp_path) == []
+    assert cache.load(tmp_path, "a") is None
+
+
+def test_cache_without_pyarrow(tmp_path, monkeypatch):
+    import sys
+    import navani.echem as ec
+
+    # A None entry in sys.modules makes the import fail as if pyarrow were not installed
+    monkeypatch.setitem(sys.modules, "pyarrow.feather", None)
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "00_test_04_MB_C01.mpr"
+    with pytest.raises(ImportError, match=r"navani\[arrow\]"):
+        ec.echem_file_loader(test_path, cache_dir=tmp_path)
+    assert os.listdir(tmp_path) == []
@@ -227,3 +227,702 @@ def test_mpr_files_from_eclab_1150(test_path):
     path = pathlib.Path(__file__).parent.parent / "Example_data" / test_path
     df = ec.echem_file_loader(path)
     assert df.shape[0] > 0
+
+
+def test_state_and_cycle_labels():
+    import navani.echem as ec
+    import numpy as np
+
+    current = [0, 0, 1.5, 2, 0, 2, -1, 0, -1, 0, 3, np.inf, -0.5]
+    state = ec.label_state(current)
+    assert state.codes.dtype == np.int8
+    assert list(state) == ['R', 'R', 0, 0, 'R', 0, 1, 'R', 1, 'R', 0, 0, 1]
+
+    cycle_change, half_cycle = ec.label_cycles(state)
+    assert cycle_change.tolist() == [False, False, True, False, False, False, True, False, False, False, True, False, True]
+    assert half_cycle.tolist() == [0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 4]
+
+    # Without a rest state zeros are grouped with the positive values
+    state = ec.label_state([0, 1, -1, -2, 0], rest=False)
+    assert list(state) == [0, 0, 1, 1, 0]
+    assert ec.label_cycles(state)[1].tolist() == [1, 1, 2, 2, 3]
+
+    with pytest.raises(ValueError):
+        ec.label_state([1, np.nan])
+
+
+def test_capacity_zeroing_by_half_cycle():
+    import navani.echem as ec
+    import pandas as pd
+
+    capacity = pd.Series([5.0, 5.0, 6.0, 7.0, 7.0, 9.0, 10.0])
+    half_cycle = [0, 0, 1, 1, 1, 2, 2]
+    rest = pd.Series([True, True, False, False, True, True, False])
+
+    # The initial rest half cycle has no non-rest points so is left unchanged
+    zeroed = ec.zero_by_half_cycle(capacity, half_cycle, mask=~rest)
+    assert zeroed.tolist() == [5.0, 5.0, 0.0, 1.0, 1.0, -1.0, 0.0]
+    assert ec.zero_by_half_cycle(capacity, half_cycle).tolist() == [0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1.0]
+    assert ec.cumsum_by_half_cycle(capacity, half_cycle).tolist() == [5.0, 10.0, 6.0, 13.0, 20.0, 9.0, 19.0]
+
+
+def test_cycle_summary_does_not_modify_input():
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame({
+        'Current': [0.0, 1.0, 1.0, 0.0, -1.0, -1.0, 1.0, 1.0],
+        'Voltage': [3.0, 3.0, 4.0, 4.0, 4.0, 3.0, 3.0, 4.0],
+        'Capacity': [0.0, 0.0, 1.0, 1.0, 0.0, 2.0, 0.0, 1.0],
+    })
+    df['state'] = ec.label_state(df['Current'])
+    df['cycle change'], df['half cycle'] = ec.label_cycles(df['state'])
+    original = df.copy()
+
+    summary_df = ec.cycle_summary(df)
+    pd.testing.assert_frame_equal(df, original)
+
+    assert summary_df.index.tolist() == [0.0, 1.0, 2.0]
+    np.testing.assert_allclose(summary_df['UCV'], [3.0, 4.0, 4.0])
+    np.testing.assert_allclose(summary_df['Discharge Capacity'], [np.nan, 2.0, np.nan])
+    np.testing.assert_allclose(summary_df['Charge Capacity'], [np.nan, 1.0, 1.0])
+    # Half cycle 1 includes the trailing rest, the integral of voltage over capacity is 3.5 over a capacity of 1
+    np.testing.assert_allclose(summary_df['Average Charge Voltage'], [np.nan, 3.5, 3.5])
+    np.testing.assert_allclose(summary_df['Average Discharge Voltage'], [np.nan, 3.5, np.nan])
+
+    # Average voltages are only added for the directions that have a half cycle
+    charge_only = df[df['Current'] >= 0].reset_index(drop=True)
+    assert 'Average Discharge Voltage' not in ec.cycle_summary(charge_only)
+    assert 'Average Charge Voltage' in ec.cycle_summary(charge_only)
+
+
+def test_dqdv_cycles_matches_single_cycle():
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+
+    kwargs = dict(window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=51, polyorder_2=5)
+    cycles = [1, 2, 5]
+    voltage, dqdv, capacity = ec.dqdv_cycles(df, cycles, **kwargs)
+    assert voltage.shape == dqdv.shape == capacity.shape == (3, 10000)
+
+    for count, cycle in enumerate(cycles):
+        mask = df["half cycle"] == cycle
+        single = ec.dqdv_single_cycle(df["Capacity"][mask], df["Voltage"][mask], **kwargs)
+        np.testing.assert_allclose(voltage[count], single[0])
+        np.testing.assert_allclose(dqdv[count], single[1])
+        np.testing.assert_allclose(capacity[count], single[2])
+
+    with pytest.raises(ValueError):
+        ec.dqdv_cycles(df, [1000], **kwargs)
+
+
+def test_dqdv_cycles_parallel_matches_serial():
+    import navani.echem as ec
+    import numpy as np
+    from concurrent.futures import Executor
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+
+    kwargs = dict(window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=51, polyorder_2=5)
+    serial = ec.dqdv_cycles(df, [1, 2, 3, 4, 5], **kwargs)
+    parallel = ec.dqdv_cycles(df, [1, 2, 3, 4, 5], n_jobs=2, chunksize=2, **kwargs)
+    for serial_array, parallel_array in zip(serial, parallel):
+        np.testing.assert_array_equal(serial_array, parallel_array)
+
+    class RecordingExecutor(Executor):
+        # A caller-supplied executor, without the private attributes of the standard library pools
+        def __init__(self):
+            self.chunks = []
+
+        def map(self, func, chunks):
+            self.chunks = list(chunks)
+            return map(func, self.chunks)
+
+    # The chunks are sized from n_jobs, four per worker
+    executor = RecordingExecutor()
+    parallel = ec.dqdv_cycles(df, [1, 2, 3, 4, 5], n_jobs=1, executor=executor, **kwargs)
+    assert [len(chunk) for chunk in executor.chunks] == [2, 2, 1]
+    for serial_array, parallel_array in zip(serial, parallel):
+        np.testing.assert_array_equal(serial_array, parallel_array)
+
+
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_load_many(n_jobs):
+    import navani.echem as ec
+
+    data_dir = pathlib.Path(__file__).parent.parent / "Example_data"
+    paths = [str(data_dir / "00_test_04_MB_C01.mpr"), str(data_dir / "test.nda"), str(data_dir / "missing.mpr")]
+    frames, report = ec.load_many(paths, mass={paths[0]: 2.0}, n_jobs=n_jobs)
+
+    assert list(frames) == paths[:2]
+    assert "Specific Capacity" in frames[paths[0]] and "Specific Capacity" not in frames[paths[1]]
+    assert report.loc[paths[1], "rows"] == len(frames[paths[1]])
+    assert report.loc[paths[0], "error"] is None
+    assert report.loc[paths[2], "error"].startswith("FileNotFoundError")
+    assert (report["seconds"] >= 0).all()
+
+    frames, report = ec.load_many(str(data_dir / "00_test_0*_MB_C01.mpr"), concat=True, n_jobs=n_jobs)
+    assert len(report) == 2
+    assert frames.index.names[0] == "file"
+    assert len(frames) == report["rows"].sum()
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+def test_arrow_round_trip(tmp_path, extension):
+    import navani.echem as ec
+    import pandas as pd
+
+    pytest.importorskip("pyarrow")
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "test.ndax"
+    df = ec.echem_file_loader(test_path, mass=2.0)
+    df.attrs["units"] = {"Capacity": "Ah"}
+
+    output_path = tmp_path / f"processed{extension}"
+    ec.echem_file_writer(df, output_path)
+    reloaded = ec.echem_file_loader(output_path)
+
+    pd.testing.assert_frame_equal(df, reloaded, check_like=False)
+    assert reloaded["state"].dtype == "category"
+    assert list(reloaded["state"].cat.categories) == list(df["state"].cat.categories)
+    assert reloaded.attrs["units"]["Capacity"] == "Ah"
+    assert reloaded.attrs["units"]["Specific Capacity"] == "mAh/g"
+
+
+def test_writer_rejects_unknown_extensions(tmp_path):
+    import navani.echem as ec
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "test.ndax"
+    df = ec.echem_file_loader(test_path)
+    for name in ["processed.xlsx", "processed.parqet", "processed"]:
+        with pytest.raises(ValueError, match="Cannot write"):
+            ec.echem_file_writer(df, tmp_path / name)
+    assert list(tmp_path.iterdir()) == []
+
+    ec.echem_file_writer(df, tmp_path / "processed.csv")
+    assert len(ec.echem_file_loader(tmp_path / "processed.csv")) == len(df)
+
+
+def test_compact_loading():
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+    compact = ec.echem_file_loader(test_path, compact=True)
+
+    assert "time/s" not in compact and "Time" in compact
+    assert compact["state"].dtype == "category"
+    assert compact["Voltage"].dtype == np.float32
+    assert pd.api.types.is_integer_dtype(compact["full cycle"])
+    # The time keeps float64 as float32 cannot resolve the time step this long into the test
+    assert compact["Time"].dtype == np.float64
+    saved = df.memory_usage(deep=True).sum() - compact.memory_usage(deep=True).sum()
+    assert compact.attrs["memory saved"] == saved > 0
+
+    pd.testing.assert_frame_equal(ec.cycle_summary(df), ec.cycle_summary(compact), rtol=1e-6)
+
+
+def test_read_sql_columns_in_chunks():
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+    import sqlite3
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute('CREATE TABLE "Channel_Normal_Table" (Data_Point INTEGER, Voltage REAL, Note TEXT)')
+    rows = [(i, 3.0 + i / 10, None) for i in range(7)] + [(None, None, "end")]
+    connection.executemany('INSERT INTO "Channel_Normal_Table" VALUES (?, ?, ?)', rows)
+
+    expected = pd.read_sql_query('SELECT * FROM "Channel_Normal_Table"', connection)
+    df = ec._read_sql_columns(connection, "Channel_Normal_Table", chunksize=3)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert np.isnan(df["Data_Point"].iloc[-1])
+
+    df = ec._read_sql_columns(connection, "Channel_Normal_Table", columns=["Voltage"], chunksize=3)
+    assert list(df.columns) == ["Voltage"]
+    assert df["Voltage"].dtype == np.float64
+
+    # Columns that are NULL for the whole first chunk, or only have NULLs later on, are still read as floats
+    connection.execute('CREATE TABLE "Leading_Nulls" (Data_Point INTEGER, Voltage REAL, Cycle_Index INTEGER)')
+    rows = [(i, None if i < 7 else 3.0 + i / 10, None if i < 4 or i == 9 else i // 3) for i in range(11)]
+    connection.executemany('INSERT INTO "Leading_Nulls" VALUES (?, ?, ?)', rows)
+    df = ec._read_sql_columns(connection, "Leading_Nulls", chunksize=3)
+    expected = pd.read_sql_query('SELECT * FROM "Leading_Nulls"', connection)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert df["Data_Point"].dtype == np.int64
+    assert df["Voltage"].dtype == np.float64 and df["Cycle_Index"].dtype == np.float64
+
+
+def test_arbin_res_reader_reuses_sqlite(tmp_path, monkeypatch):
+    import navani.echem as ec
+    import numpy as np
+    import os
+    import pandas as pd
+    import sqlite3
+    import tempfile
+    from galvani import res2sqlite
+
+    current = np.repeat([0.0, 1.0, -1.0, 1.0], 5)
+    table = pd.DataFrame({
+        "Data_Point": np.arange(len(current)),
+        "Test_Time": np.arange(len(current), dtype=float),
+        "Current": current,
+        "Voltage": np.linspace(3, 4, len(current)),
+        "Charge_Capacity": np.cumsum(current > 0) * 0.1,
+        "Discharge_Capacity": np.cumsum(current < 0) * 0.1,
+    })
+    conversions = []
+
+    def convert(res_file, sqlite_file):
+        conversions.append(res_file)
+        with sqlite3.connect(sqlite_file) as connection:
+            table.to_sql("Channel_Normal_Table", connection, index=False)
+
+    monkeypatch.setattr(res2sqlite, "convert_arbin_to_sqlite", convert)
+    res_path = tmp_path / "test.res"
+    res_path.write_bytes(b"not really an mdb file")
+
+    df = ec.arbin_res_reader(res_path, sqlite_dir=tmp_path / "sqlite", chunksize=7)
+    assert df["half cycle"].max() == 3
+    assert df["Capacity"].max() == pytest.approx(0.4)
+
+    df = ec.arbin_res_reader(res_path, columns=["Voltage"], sqlite_dir=tmp_path / "sqlite")
+    assert "Test_Time" not in df and "Voltage" in df
+    assert len(conversions) == 1
+
+    # Without a sqlite_dir the conversion is not kept in the temporary directory
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    df = ec.arbin_res_reader(res_path)
+    assert df["half cycle"].max() == 3
+    assert len(conversions) == 2
+    assert os.listdir(tmp_path / "tmp") == []
+
+    # echem_file_loader passes sqlite_dir on to the reader, so reloading the file reuses the conversion
+    loader_path = tmp_path / "loader.res"
+    loader_path.write_bytes(b"\x00\x01\x00\x00Standard Jet DB")
+    for _ in range(2):
+        df = ec.echem_file_loader(loader_path, sqlite_dir=tmp_path / "sqlite")
+        assert df["half cycle"].max() == 3
+    assert len(conversions) == 3
+
+
+@pytest.mark.parametrize("extension", [".txt", ".res", ".csv"])
+def test_iter_echem_chunks_matches_whole_file(tmp_path, monkeypatch, extension):
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+    import sqlite3
+    from galvani import res2sqlite
+
+    rng = np.random.default_rng(0)
+    # Steps of charge, rest and discharge with lengths that do not line up with the chunks
+    steps = [(1.0, 23), (0.0, 11), (-1.0, 37), (0.0, 5), (-1.0, 9), (1.0, 41), (0.0, 17), (1.0, 13)]
+    current = np.concatenate([np.full(n, sign) for sign, n in steps]) * rng.uniform(0.5, 1.5, sum(n for _, n in steps))
+    time = np.cumsum(rng.uniform(0.5, 1.5, len(current)))
+    voltage = np.linspace(3, 4, len(current))
+
+    if extension == ".txt":
+        path = tmp_path / "ivium.txt"
+        pd.DataFrame({"time /s": time, "I /mA": current, "E /V": voltage}).to_csv(path, sep="\t", index=False)
+    elif extension == ".res":
+        table = pd.DataFrame({
+            "Data_Point": np.arange(len(current)),
+            "Test_Time": time,
+            "Current": current,
+            "Voltage": voltage,
+            "Charge_Capacity": np.cumsum(np.clip(current, 0, None)),
+            "Discharge_Capacity": np.cumsum(np.clip(-current, 0, None)),
+        })
+
+        def convert(res_file, sqlite_file):
+            with sqlite3.connect(sqlite_file) as connection:
+                # Stored out of order, the chunks must still follow the data points
+                table.sample(frac=1, random_state=0).to_sql("Channel_Normal_Table", connection, index=False)
+
+        monkeypatch.setattr(res2sqlite, "convert_arbin_to_sqlite", convert)
+        path = tmp_path / "arbin.res"
+        path.write_bytes(b"not really an mdb file")
+    else:
+        path = tmp_path / "processed.csv"
+        df = pd.DataFrame({"Current": current, "Voltage": voltage, "Time": time})
+        df["state"] = ec.label_state(df["Current"])
+        df["cycle change"], df["half cycle"] = ec.label_cycles(df["state"])
+        df["Capacity"] = ec.cumsum_by_half_cycle(abs(df["Current"]), df["half cycle"])
+        df["full cycle"] = np.ceil(df["half cycle"] / 2)
+        df.to_csv(path)
+
+    chunks = list(ec.iter_echem_chunks(str(path), chunksize=10, mass=2.0, sqlite_dir=tmp_path))
+    assert len(chunks) == int(np.ceil(len(current) / 10))
+    chunked = pd.concat(chunks)
+    if extension == ".res":
+        whole = ec.arbin_res_reader(str(path), sqlite_dir=tmp_path)
+        whole = ec._add_derived_columns(whole, mass=2.0)
+    else:
+        whole = ec.echem_file_loader(str(path), mass=2.0)
+
+    assert chunked.index.equals(whole.index)
+    assert chunked["state"].astype(object).tolist() == whole["state"].astype(object).tolist()
+    np.testing.assert_array_equal(chunked["half cycle"], whole["half cycle"])
+    np.testing.assert_array_equal(chunked["full cycle"], whole["full cycle"])
+    np.testing.assert_allclose(chunked["Capacity"], whole["Capacity"], rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(chunked["Specific Capacity"], whole["Specific Capacity"], rtol=1e-12, atol=1e-12)
+    assert whole["half cycle"].max() >= 3
+
+
+@pytest.mark.parametrize("filename", ["jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr", "00_test_04_MB_C01.mpr", "ivium.txt"])
+def test_incremental_loader_matches_whole_file(tmp_path, monkeypatch, filename):
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+    import galvani
+    from galvani import MPRfile
+
+    if filename.endswith(".mpr"):
+        path = pathlib.Path(__file__).parent.parent / "Example_data" / filename
+        data = MPRfile(str(path)).data
+        available = [len(data) // 7, len(data) // 7, len(data) // 2 + 3, len(data)]
+
+        def growing_memmap(filepath):
+            # The records of the file as it would be mapped part way through the test
+            return data[:available[0]]
+
+        def fail(filepath):
+            raise AssertionError("the whole file was parsed again")
+
+        loader = ec.IncrementalLoader(path, mass=2.0)
+        monkeypatch.setattr(ec, "mpr_memmap", growing_memmap)
+        monkeypatch.setattr(galvani, "MPRfile", fail)
+        updates = []
+        while available:
+            updates.append(len(loader.update()))
+            available.pop(0)
+        monkeypatch.undo()
+    else:
+        rng = np.random.default_rng(0)
+        current = np.repeat([1.0, -1.0, 0.0, -1.0, 1.0], [30, 40, 10, 25, 35]) * rng.uniform(0.5, 1.5, 140)
+        time = np.cumsum(rng.uniform(0.5, 1.5, len(current)))
+        text = pd.DataFrame({"time /s": time, "I /mA": current, "E /V": np.linspace(3, 4, len(current))}).to_csv(sep="\t", index=False)
+        path = tmp_path / filename
+        loader = ec.IncrementalLoader(path, mass=2.0)
+        updates = []
+        # Including writes that stop part way through a line
+        for stop in [0, 10, 500, 1203, 2500, len(text)]:
+            path.write_text(text[:stop])
+            updates.append(len(loader.update()))
+
+    whole = ec.echem_file_loader(str(path), mass=2.0)
+    assert sum(updates) == len(whole) == loader.n_rows
+    assert updates.count(0) >= 1
+    df = loader.df
+    assert df.index.equals(whole.index)
+    np.testing.assert_array_equal(df["half cycle"], whole["half cycle"])
+    np.testing.assert_allclose(df["Capacity"], whole["Capacity"], rtol=1e-12, atol=1e-12)
+    if "Current" in whole:
+        np.testing.assert_allclose(df["Current"], whole["Current"], rtol=1e-12)
+
+    summary = ec.cycle_summary(whole)
+    incremental = loader.cycle_summary()
+    assert list(incremental.columns) == list(summary.columns)
+    np.testing.assert_allclose(incremental.to_numpy(dtype=float), summary.to_numpy(dtype=float), rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_landdt_multi_sheet_excel(tmp_path, n_jobs):
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+
+    current = np.repeat([0.0, 1.0, -1.0, 1.0], 10)
+    records = pd.DataFrame({
+        "Index": np.arange(1, len(current) + 1),
+        "Current/mA": current,
+        "Voltage/V": np.linspace(3, 4, len(current)),
+        "Capacity/mAh": np.arange(len(current)) * 0.1,
+    })
+    path = tmp_path / "landdt.xlsx"
+    # Landdt splits long records over several sheets, only the first has a header
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        records.iloc[:15].to_excel(writer, sheet_name="Record", index=False)
+        pd.DataFrame().to_excel(writer, sheet_name="Record1", index=False, header=False)
+        records.iloc[15:].to_excel(writer, sheet_name="Record2", index=False, header=False)
+        records.head(2).to_excel(writer, sheet_name="Cycle", index=False)
+
+    df = ec.echem_file_loader(str(path), n_jobs=n_jobs)
+    np.testing.assert_array_equal(df.index, records["Index"])
+    np.testing.assert_allclose(df["Capacity"], records["Capacity/mAh"])
+    assert df["half cycle"].max() == 3
+
+
+def test_excel_engine_is_opt_in():
+    import navani.echem as ec
+    import pandas as pd
+
+    # Loads do not depend on which optional packages are installed
+    assert ec.excel_engine(".xlsx") == "openpyxl"
+    assert ec.excel_engine(".xls") is None
+
+    pytest.importorskip("python_calamine")
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "bs542_004_gr_li_50ua_50mv_1v_191020_Channel_11.xlsx"
+    df = ec.echem_file_loader(test_path)
+    fast = ec.echem_file_loader(test_path, engine="calamine")
+    columns = [column for column in df.columns if column != "Date_Time"]
+    pd.testing.assert_frame_equal(df[columns], fast[columns], check_dtype=False)
+
+
+@pytest.mark.parametrize("filename", ["00_test_04_MB_C01.mpr", "test.ndax", "bs542_004_gr_li_50ua_50mv_1v_191020_Channel_11.xlsx"])
+def test_loader_columns(filename):
+    import navani.echem as ec
+    import pandas as pd
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / filename
+    columns = ["Capacity", "Voltage", "Current", "state", "half cycle", "full cycle"]
+    df = ec.echem_file_loader(test_path, columns=columns)
+    assert list(df.columns) == columns
+    pd.testing.assert_frame_equal(df, ec.echem_file_loader(test_path)[columns])
+    pd.testing.assert_frame_equal(ec.cycle_summary(df), ec.cycle_summary(ec.echem_file_loader(test_path)))
+
+
+def test_mpr_memory_map():
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+    from galvani import MPRfile
+
+    for filename in ["00_test_04_MB_C01.mpr", "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"]:
+        test_path = pathlib.Path(__file__).parent.parent / "Example_data" / filename
+        data = ec.mpr_memmap(test_path)
+        assert isinstance(data, np.memmap)
+        np.testing.assert_array_equal(data, MPRfile(str(test_path)).data)
+
+        df = ec.echem_file_loader(test_path, memory_map=True)
+        pd.testing.assert_frame_equal(df, ec.echem_file_loader(test_path))
+        # The raw columns are views of the file rather than copies
+        assert not df["time/s"].to_numpy().flags.writeable
+
+
+def test_reader_registry(tmp_path, monkeypatch):
+    import navani.echem as ec
+    import numpy as np
+    import pandas as pd
+    import shutil
+
+    monkeypatch.setattr(ec, "readers", dict(ec.readers))
+
+    @ec.register_reader("toy", [".toy"], sniff=ec._magic_sniff(b"TOY"))
+    def read_toy(filepath, columns=None, **options):
+        current = np.repeat([1.0, -1.0], 5)
+        df = pd.DataFrame({"Current": current, "Voltage": np.linspace(3, 4, 10), "Capacity": np.tile(np.arange(5.0), 2)})
+        df["state"] = ec.label_state(df["Current"])
+        df["cycle change"], df["half cycle"] = ec.label_cycles(df["state"])
+        return df
+
+    toy_path = tmp_path / "cell.toy"
+    toy_path.write_bytes(b"TOY data")
+    df = ec.echem_file_loader(toy_path)
+    assert df["full cycle"].max() == 1
+
+    # Files are recognised from their contents, whatever the extension
+    mpr_path = tmp_path / "cell.dat"
+    shutil.copy(pathlib.Path(__file__).parent.parent / "Example_data" / "00_test_04_MB_C01.mpr", mpr_path)
+    assert len(ec.echem_file_loader(mpr_path)) == 1501
+
+    # Only zip archives laid out as .ndax files are taken for Neware, so a renamed .xlsx reaches the Excel readers
+    xlsx_path = tmp_path / "cell.zip"
+    shutil.copy(pathlib.Path(__file__).parent.parent / "Example_data" / "bs542_004_gr_li_50ua_50mv_1v_191020_Channel_11.xlsx", xlsx_path)
+    assert not ec._sniff("neware", xlsx_path)
+    assert ec._sniff("neware", pathlib.Path(__file__).parent.parent / "Example_data" / "test.ndax")
+    assert ec._sniff("neware", pathlib.Path(__file__).parent.parent / "Example_data" / "test.nda")
+
+    (tmp_path / "bad.toy").write_bytes(b"not a toy")
+    with pytest.raises(ValueError, match="not recognised"):
+        ec.echem_file_loader(tmp_path / "bad.toy")
+
+    # Text files written with a UTF-8 byte order mark, as from many Windows tools, are still recognised
+    ivium_path = tmp_path / "ivium.txt"
+    ivium = pd.DataFrame({"time /s": np.arange(10.0), "I /mA": np.repeat([1.0, -1.0], 5), "E /V": np.linspace(3, 4, 10)})
+    ivium.to_csv(ivium_path, sep="\t", index=False, encoding="utf-8-sig")
+    assert ivium_path.read_bytes().startswith(b"\xef\xbb\xbf")
+    assert ec.echem_file_loader(ivium_path)["half cycle"].max() == 2
+
+
+def test_import_does_not_load_optional_backends():
+    import subprocess
+    import sys
+
+    # Plotting, dQ/dV and the file format backends are only imported when first used
+    script = "import sys, navani.echem; print(' '.join(m for m in ['matplotlib', 'scipy', 'galvani', 'NewareNDA', 'sqlite3'] if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=pathlib.Path(__file__).parent.parent)
+    assert result.stdout.strip() == ""
+
+
+def test_cycle_plots_use_one_line_collection():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+
+    for fig, ax, half_cycles in [(*ec.charge_discharge_plot(df, [1, 2, 3], max_points=None), [1, 2, 3, 4, 5, 6]),
+                                 (*ec.multi_cycle_plot(df, [1, 2, 3, 4, 100], max_points=None), [1, 2, 3, 4])]:
+        assert len(ax.lines) == 0 and len(ax.collections) == 1
+        collection = ax.collections[0]
+        assert isinstance(collection, LineCollection)
+        segments = collection.get_segments()
+        # Missing half cycles are skipped
+        assert len(segments) == len(half_cycles)
+        for segment, cycle in zip(segments, half_cycles):
+            mask = df["half cycle"] == cycle
+            np.testing.assert_array_equal(segment, np.column_stack([df["Capacity"][mask], df["Voltage"][mask]]))
+        assert ax.get_xlim()[1] >= df["Capacity"][df["half cycle"].isin(half_cycles)].max()
+        plt.close(fig)
+
+
+def test_decimate_minmax():
+    import navani.echem as ec
+    import numpy as np
+
+    x = np.linspace(0, 10, 100_001)
+    points = np.column_stack([x, np.sin(x) + np.random.default_rng(0).normal(0, 0.01, len(x))])
+    decimated = ec.decimate_minmax(points, 1000)
+    assert len(decimated) <= 1000
+    # The kept points are original points in order, including the end points and the extremes
+    assert np.isin(decimated[:, 0], x).all() and (np.diff(decimated[:, 0]) > 0).all()
+    np.testing.assert_array_equal(decimated[[0, -1]], points[[0, -1]])
+    assert decimated[:, 1].max() == points[:, 1].max() and decimated[:, 1].min() == points[:, 1].min()
+    # Short lines are not changed
+    np.testing.assert_array_equal(ec.decimate_minmax(points[:1000], 1000), points[:1000])
+    assert len(ec.decimate_minmax(points, None)) == len(points)
+
+
+def test_cycle_plots_max_points():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import navani.echem as ec
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+
+    fig, ax = ec.multi_cycle_plot(df, [1, 2, 3, 4], max_points=500)
+    segments = ax.collections[0].get_segments()
+    assert len(segments) == 4 and all(len(segment) <= 500 for segment in segments)
+    for segment, cycle in zip(segments, [1, 2, 3, 4]):
+        # The voltage range of each half cycle is unchanged
+        voltage = df["Voltage"][df["half cycle"] == cycle]
+        assert segment[:, 1].min() == voltage.min() and segment[:, 1].max() == voltage.max()
+    plt.close(fig)
+
+
+def test_cycle_index():
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+
+    assert df.cycles.half.order is None and len(df.cycles.half) == df["half cycle"].nunique()
+    for cycle in df["half cycle"].unique():
+        assert df.cycles.get_cycle(cycle).equals(df[df["half cycle"] == cycle])
+    for cycle in df["full cycle"].unique():
+        assert df.cycles.get_cycle(cycle, full=True).equals(df[df["full cycle"] == cycle])
+    assert len(df.cycles.get_cycle(1000)) == 0
+
+    # Rows that are not grouped by cycle keep their order within each cycle
+    shuffled = df.iloc[np.random.default_rng(0).permutation(len(df))]
+    assert shuffled.cycles.half.order is not None
+    for cycle in [1, 2, 3]:
+        assert shuffled.cycles.get_cycle(cycle).equals(shuffled[shuffled["half cycle"] == cycle])
+
+    # Replacing the column rebuilds the index
+    df["half cycle"] = df["half cycle"] + 1
+    assert df.cycles.get_cycle(2).equals(df[df["half cycle"] == 2])
+
+
+def test_analysis_follows_in_place_cycle_edits():
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+    df.cycles.get_cycle(1)
+
+    # Editing the column in place keeps its buffer, the analysis must still follow the new cycle numbers
+    df.loc[:, "half cycle"] = df["half cycle"] + 10
+    df.loc[:, "full cycle"] = np.ceil(df["half cycle"] / 2)
+    summary = ec.cycle_summary(df)
+    assert list(summary.index) == sorted(df["full cycle"].unique())
+
+    cycle = df[df["half cycle"] == 12]
+    x_volt, dqdv, _ = ec.dqdv_cycles(df, [12], method="finite_difference")
+    expected_volt, expected_dqdv, _ = ec.dqdv_single_cycle(cycle["Capacity"], cycle["Voltage"], method="finite_difference")
+    np.testing.assert_allclose(x_volt[0], expected_volt)
+    np.testing.assert_allclose(dqdv[0], expected_dqdv)
+
+
+@pytest.mark.parametrize("method, kwargs, tolerance", [("finite_difference", {"window_size_1": 51, "polyorder_1": 5}, 0.1),
+                                                        ("histogram", {"window_size_1": 7, "polyorder_1": 3, "num_points": 1500}, 0.1)])
+def test_dqdv_fast_methods_follow_spline(method, kwargs, tolerance):
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+    cycles = [2, 3]
+    reference_x, reference, _ = ec.dqdv_cycles(df, cycles, window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=51, polyorder_2=5)
+    voltage, dqdv, capacity = ec.dqdv_cycles(df, cycles, method=method, **kwargs)
+    assert voltage.shape == dqdv.shape == capacity.shape == (2, kwargs.get("num_points", 10000))
+
+    for i, cycle in enumerate(cycles):
+        inner = slice(voltage.shape[1] // 20, -(voltage.shape[1] // 20))
+        expected = np.interp(voltage[i], reference_x[i], reference[i])[inner]
+        assert np.linalg.norm(dqdv[i][inner] - expected) / np.linalg.norm(expected) < tolerance
+        # The single cycle function gives the same curve
+        mask = df["half cycle"] == cycle
+        single = ec.dqdv_single_cycle(df["Capacity"][mask], df["Voltage"][mask], method=method, **kwargs)
+        np.testing.assert_allclose(single[1], dqdv[i])
+
+    with pytest.raises(ValueError):
+        ec.dqdv_cycles(df, cycles, method="unknown")
+
+
+def test_dqdv_auto_grid():
+    import navani.echem as ec
+    import numpy as np
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    df = ec.echem_file_loader(test_path)
+    kwargs = dict(window_size_1=51, polyorder_1=5, s_spline=0.0, window_size_2=51, polyorder_2=5)
+
+    mask = df["half cycle"] == 2
+    capacity, voltage = df["Capacity"][mask], df["Voltage"][mask]
+    x, dqdv, _ = ec.dqdv_single_cycle(capacity, voltage, **kwargs)
+    x_auto, dqdv_auto, capacity_auto = ec.dqdv_single_cycle(capacity, voltage, num_points="auto", **kwargs)
+    # One grid point per distinct voltage, and the same curve as on the default grid
+    assert len(x_auto) == len(dqdv_auto) == len(capacity_auto) == voltage.nunique()
+    inner = slice(len(x_auto) // 20, -(len(x_auto) // 20))
+    expected = np.interp(x_auto, x, dqdv)[inner]
+    assert np.linalg.norm(dqdv_auto[inner] - expected) / np.linalg.norm(expected) < 0.05
+
+    # A batch uses the grid of its densest cycle
+    voltage_batch, dqdv_batch, _ = ec.dqdv_cycles(df, [1, 2, 3], num_points="auto", **kwargs)
+    assert dqdv_batch.shape == (3, max(df["Voltage"][df["half cycle"] == cycle].nunique() for cycle in [1, 2, 3]))
+
+    # The windows keep their width in volts, odd and longer than the polynomial order
+    num_points, window_1, window_2 = ec._auto_grid([(capacity.to_numpy(), voltage.to_numpy())], "spline", 5, 101, 5, 1001)
+    assert num_points == voltage.nunique()
+    assert window_1 % 2 == 1 and window_2 % 2 == 1 and window_1 > 5
+    assert abs(window_2 - 1001 * num_points / ec.dqdv_default_points) <= 1
+    num_points, window_1, _ = ec._auto_grid([(np.arange(10.0), np.arange(10.0))], "spline", 5, 101, 5, 1001)
+    assert num_points == ec.dqdv_min_points and window_1 == 7
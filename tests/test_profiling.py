@@ -0,0 +1,47 @@
+import pathlib
+
+
+def test_profile_loader_and_analysis():
+    import navani.echem as ec
+    import navani.profiling as profiling
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "jdb11-1_c3_gcpl_5cycles_2V-3p8V_C-24_data_C09.mpr"
+    finished = []
+    with profiling.profile(hook=finished.append) as report:
+        df = ec.echem_file_loader(test_path)
+        ec.cycle_summary(df)
+        ec.dqdv_single_cycle(df["Capacity"][df["half cycle"] == 2], df["Voltage"][df["half cycle"] == 2])
+
+    records = report.to_frame().set_index("path")
+    assert finished == report.records
+    for path in ["echem_file_loader", "echem_file_loader/read biologic", "echem_file_loader/read biologic/biologic_processing",
+                 "echem_file_loader/read biologic/biologic_processing/label_state", "echem_file_loader/derived columns",
+                 "cycle_summary/half cycle statistics", "dqdv_single_cycle/spline"]:
+        assert path in records.index
+    assert records.loc["echem_file_loader", "rows"] == len(df)
+    assert records.loc["echem_file_loader/read biologic", "rows"] == len(df)
+    assert (records["self seconds"] <= records["seconds"]).all()
+    assert records["memory peak"].notna().all()
+    # The loader's time covers its stages
+    loader_stages = records[records.index.str.startswith("echem_file_loader/") & (records["depth"] == 1)]
+    assert loader_stages["seconds"].sum() <= records.loc["echem_file_loader", "seconds"]
+    assert report.summary().loc["echem_file_loader", "calls"] == 1
+
+
+def test_profile_is_opt_in():
+    import navani.echem as ec
+    import navani.profiling as profiling
+    import tracemalloc
+
+    test_path = pathlib.Path(__file__).parent.parent / "Example_data" / "00_test_01_OCV_C01.mpr"
+    with profiling.profile(memory=False) as report:
+        ec.echem_file_loader(test_path)
+    assert not tracemalloc.is_tracing()
+    assert len(report.records) > 0 and report.to_frame()["memory delta"].isna().all()
+
+    # Nothing is recorded outside a profile block
+    count = len(report.records)
+    ec.echem_file_loader(test_path)
+    with profiling.stage("outside") as record:
+        record["rows"] = 1
+    assert len(report.records) == count
@@ -0,0 +1,48 @@
+import pytest
+
+
+def test_generate_cycling():
+    import navani.synthetic as synthetic
+    import numpy as np
+
+    df = synthetic.generate_cycling(20_000, 5, cv_time=1800, fade=0.02, noise=0, seed=0)
+    assert len(df) == 20_000 and df["cycle"].max() == 5
+    assert (np.diff(df["Time"]) > 0).all()
+    assert set(df["step"]) == {"CC_Chg", "CV_Chg", "Rest", "CC_DChg"}
+    assert (df["Current"][df["step"] == "Rest"] == 0).all()
+    assert df["Voltage"].min() >= 3.0 - 1e-9 and df["Voltage"].max() <= 4.2 + 1e-9
+
+    with pytest.raises(ValueError):
+        synthetic.generate_cycling(10, 5)
+
+
+@pytest.mark.parametrize("layout", ["biologic", "biologic_dq", "arbin_excel", "navani"])
+def test_raw_layouts_process_to_the_same_cycles(layout):
+    import navani.echem as ec
+    import navani.synthetic as synthetic
+    import numpy as np
+
+    fade = 0.05
+    df = synthetic.generate_cycling(20_000, 5, fade=fade, seed=0)
+    raw = synthetic.raw_layout(df, layout)
+    processor = synthetic.layouts[layout]
+    processed = raw if processor is None else getattr(ec, processor)(raw)
+
+    capacity = processed.groupby("half cycle")["Capacity"].max()
+    capacity = capacity[capacity > 0]
+    assert len(capacity) == 10
+    # The charge and discharge capacity follow the fade from 1 mAh
+    np.testing.assert_allclose(capacity.to_numpy(), np.repeat((1 - fade) ** np.arange(5), 2), rtol=5e-3)
+
+
+@pytest.mark.parametrize("extension", [".txt", ".xlsx", ".csv"])
+def test_write_synthetic(tmp_path, extension):
+    import navani.echem as ec
+    import navani.synthetic as synthetic
+
+    df = synthetic.generate_cycling(5_000, 3, seed=0)
+    path = tmp_path / ("synthetic" + extension)
+    synthetic.write_synthetic(df, path)
+    loaded = ec.echem_file_loader(path)
+    assert len(loaded) == len(df)
+    assert loaded["full cycle"].max() >= 3